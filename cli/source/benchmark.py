@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+from docdblite import Collection, DbConfig, DocDbLite, StorageEngine
+
+DOC_COUNT = 500
+FIND_ONE_ROUNDS = 5
+
+
+def build_doc(i: int) -> dict:
+    """A product document similar in shape to the catalog sample in main.py."""
+    return {
+        "id": f"KA{i:05d}",
+        "name": f"SmartChef Oven {i}",
+        "brand": "HomeTech",
+        "price": 599.99,
+        "currency": "USD",
+        "inStock": True,
+        "specifications": {
+            "capacity": "30L",
+            "functions": ["Bake", "Roast", "Grill", "Air Fry"],
+            "connectivity": "Wi-Fi",
+            "powerConsumption": "1800W",
+        },
+        "reviews": [
+            {
+                "userId": f"U{i:06d}",
+                "rating": 4.6,
+                "comment": "Love the smart features and versatility! "
+                "Heats up quickly, the app works well and cleaning is easy. " * 4,
+                "date": "2024-09-08T19:17:03Z",
+            }
+        ],
+    }
+
+
+class KeyColumnCollection(Collection):
+    """The node-per-row layout before key interning, with the key string stored in every data row.
+
+    The key_id column is declared TEXT and holds the key string. Column names aren't stored per row,
+    so the rows are the same size as the original `key TEXT` layout.
+    """
+
+    def _create_tables(self, db_ctx):
+        with db_ctx as db:
+            db.conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self._collection_document_data_table_name} (
+                    uuid TEXT(36) PRIMARY KEY,
+                    doc_id TEXT(36) NOT NULL,
+                    parent_uuid TEXT(36),
+                    key_id TEXT NOT NULL, -- key string
+                    type integer NOT NULL,
+                    value
+                )
+                """
+            )
+            db.conn.commit()
+        super()._create_tables(db_ctx)
+
+    def _get_key_id(self, key, db, create=False):  # type: ignore
+        return key
+
+    def _get_key(self, key_id, db):  # type: ignore
+        return key_id
+
+
+def run(
+    label: str,
+    compression: Optional[str],
+    storage_engine: StorageEngine = StorageEngine.NODES,
+    collection_class: Optional[type[Collection]] = None,
+) -> tuple[float, float]:
+    data_dir = tempfile.mkdtemp(prefix="docdblite-bench-")
+    try:
+        db_config = DbConfig(data_dir, compression=compression)  # type: ignore
+        if collection_class is not None:
+            collection = collection_class(db_config, "bench")
+        else:
+            collection = DocDbLite(db_config).add_collection("bench", storage_engine)
+
+        doc_ids = [collection.insert_one(build_doc(i)) for i in range(DOC_COUNT)]
+
+        round_seconds = []
+        for _ in range(FIND_ONE_ROUNDS):
+            start = time.perf_counter()
+            for doc_id in doc_ids:
+                collection.find_one(doc_id)
+            round_seconds.append(time.perf_counter() - start)
+        # best round, the others are mostly noise from the machine
+        find_one_us = min(round_seconds) / DOC_COUNT * 1_000_000
+
+        with collection.db_ctx as ctx:
+            ctx.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            ctx.conn.execute("VACUUM")
+        collection.db_ctx.close()
+
+        file_bytes = os.path.getsize(os.path.join(data_dir, "bench.sqlite"))
+        bytes_per_doc = file_bytes / DOC_COUNT
+        print(
+            f"{label:<24} bytes/doc: {bytes_per_doc:>9.1f}   find_one: {find_one_us:>8.1f} us"
+        )
+        return bytes_per_doc, find_one_us
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    print(f"documents: {DOC_COUNT}, find_one: best of {FIND_ONE_ROUNDS} rounds")
+    base_bytes, base_us = run("key strings (baseline)", None, collection_class=KeyColumnCollection)
+    for label, compression, storage_engine in (
+        ("interned keys", None, StorageEngine.NODES),
+        ("interned keys + zlib", "zlib", StorageEngine.NODES),
+        ("interned keys + lzma", "lzma", StorageEngine.NODES),
+        ("json storage engine", None, StorageEngine.JSON),
+    ):
+        bytes_per_doc, us = run(label, compression, storage_engine)
+        print(
+            f"{'':<24} bytes/doc reduction: {(1 - bytes_per_doc / base_bytes) * 100:>5.1f}%   find_one change: {(us / base_us - 1) * 100:>+6.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
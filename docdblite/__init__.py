@@ -2,6 +2,16 @@ from source.collection import Collection
 from source.db_config import DbConfig
 from source.db_ctx import DbCtx
 from source.doc_db_lite import DocDbLite
+from source.json_collection import JsonCollection
 from source.object_id import ObjectId
+from source.storage_engine import StorageEngine
 
-__all__ = ["DocDbLite", "ObjectId", "Collection", "DbConfig", "DbCtx"]
\ No newline at end of file
+__all__ = [
+    "DocDbLite",
+    "ObjectId",
+    "Collection",
+    "JsonCollection",
+    "StorageEngine",
+    "DbConfig",
+    "DbCtx",
+]
\ No newline at end of file
@@ -1,24 +1,77 @@
 import json
+import lzma
+import sqlite3
+import time
+import zlib
 from datetime import datetime
-from typing import Any, Mapping, Optional, Union
+from threading import Lock
+from typing import Any, Iterator, Mapping, Optional, Union
 
 from source.db_config import DbConfig
 from source.db_ctx import DbCtx
+from source.db_ctx_cache import DbCtxCache
 from source.db_value_type import DbValueType
 from source.object_id import ObjectId
+from source.storage_engine import StorageEngine
 
 
 class Collection:
-    def __init__(self, db_config: DbConfig, name: str):
+    storage_engine = StorageEngine.NODES
+
+    def __init__(
+        self,
+        db_config: DbConfig,
+        name: str,
+        db_ctx_cache: Optional[DbCtxCache] = None,
+    ):
+        """The collection database is opened, and its tables created, lazily on first use.
+        If `db_ctx_cache` is given, the collection's connection pool is closed when it goes cold.
+        """
         self.db_config = db_config
         self.name = name.strip().lower()
-        self.db_ctx = DbCtx(self.db_config, name)
+        self._database_name = name
+        self._db_ctx: Optional[DbCtx] = None
+        self._db_ctx_cache = db_ctx_cache
+        self._db_ctx_lock = Lock()
         self._collection_documents_table_name = self.name
         self._collection_document_data_table_name = f"{self.name}_data"
+        self._collection_keys_table_name = f"{self.name}_keys"
+        self._collection_text_table_name = f"{self.name}_text"
+        self._collection_text_paths_table_name = f"{self.name}_text_paths"
+        self._collection_text_docs_table_name = f"{self.name}_text_docs"
+        self._collection_oplog_table_name = f"{self.name}_oplog"
+
+        # in-memory cache of the key dictionary table. key string <-> key id
+        self._key_ids: dict[str, int] = {}
+        self._keys: dict[int, str] = {}
+
+        # in-memory cache of the text index paths table
+        self._text_index_paths: set[str] = set()
+
+    @property
+    def db_ctx(self) -> DbCtx:
+        """The collection database context. Created, along with the collection tables, on first use.
+        The context registers with the db context cache each time it's used, see `DbCtx.on_use`.
+        """
+        if self._db_ctx is None:
+            with self._db_ctx_lock:
+                if self._db_ctx is None:
+                    db_ctx = DbCtx(
+                        self.db_config,
+                        self._database_name,
+                        self._db_ctx_cache.touch
+                        if self._db_ctx_cache is not None
+                        else None,
+                        self._register_sql_functions,
+                    )
+                    self._create_tables(db_ctx)
+                    self._db_ctx = db_ctx
+        return self._db_ctx
 
+    def _create_tables(self, db_ctx: DbCtx) -> None:
         # TODO: consider changing uuid from TEXT(36) to BLOB(16) for performance and space efficiency
         # each collection is database file with a table named after the collection
-        with self.db_ctx as db:
+        with db_ctx as db:
             db.conn.execute(
                 f"""
                 CREATE TABLE IF NOT EXISTS {self._collection_documents_table_name} ( -- collection of documents table
@@ -32,13 +85,281 @@ class Collection:
                     uuid TEXT(36) PRIMARY KEY, -- keyvalue id
                     doc_id TEXT(36) NOT NULL, -- document uuid
                     parent_uuid TEXT(36), -- parent keyvalue id
-                    key TEXT NOT NULL,
+                    key_id INTEGER NOT NULL, -- id of the key string in the key dictionary table
+                    type integer NOT NULL, -- type enum to map
+                    value -- sqlite is dynamic typed. Type is a hint.
+                )
+                """
+            )
+            db.conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self._collection_keys_table_name} ( -- key dictionary table
+                    id INTEGER PRIMARY KEY, -- key id referenced from the document data table
+                    key TEXT NOT NULL UNIQUE -- key string, stored once per collection
+                )
+                """
+            )
+            db.conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self._collection_text_paths_table_name} ( -- paths covered by the full-text index
+                    path TEXT PRIMARY KEY -- dot separated object keys. array indexes are not part of the path.
+                )
+                """
+            )
+            self._create_oplog_table(db)
+            db.conn.commit()
+            self._migrate_key_column(db)
+            self._load_keys(db)
+            self._load_text_index_paths(db)
+
+    def _migrate_key_column(self, db: DbCtx) -> None:
+        """Migrate a data table created before the key dictionary, which stored the key string in every row."""
+        columns = [
+            row[1]
+            for row in db.conn.execute(
+                f"PRAGMA table_info({self._collection_document_data_table_name})"
+            ).fetchall()
+        ]
+        if "key_id" in columns:
+            return
+
+        # SQLite can't change a column in place so rebuild the table with key ids
+        try:
+            db.conn.execute("BEGIN TRANSACTION")
+            db.conn.execute(
+                f"""
+                INSERT OR IGNORE INTO {self._collection_keys_table_name} (key)
+                SELECT DISTINCT key FROM {self._collection_document_data_table_name}
+                """
+            )
+            db.conn.execute(
+                f"ALTER TABLE {self._collection_document_data_table_name} RENAME TO {self._collection_document_data_table_name}_old"
+            )
+            db.conn.execute(
+                f"""
+                CREATE TABLE {self._collection_document_data_table_name} ( -- document data table
+                    uuid TEXT(36) PRIMARY KEY, -- keyvalue id
+                    doc_id TEXT(36) NOT NULL, -- document uuid
+                    parent_uuid TEXT(36), -- parent keyvalue id
+                    key_id INTEGER NOT NULL, -- id of the key string in the key dictionary table
                     type integer NOT NULL, -- type enum to map
                     value -- sqlite is dynamic typed. Type is a hint.
                 )
                 """
             )
+            db.conn.execute(
+                f"""
+                INSERT INTO {self._collection_document_data_table_name} (uuid, doc_id, parent_uuid, key_id, type, value)
+                SELECT data.uuid, data.doc_id, data.parent_uuid, keys.id, data.type, data.value
+                FROM {self._collection_document_data_table_name}_old AS data
+                JOIN {self._collection_keys_table_name} AS keys ON keys.key = data.key
+                """
+            )
+            db.conn.execute(f"DROP TABLE {self._collection_document_data_table_name}_old")
             db.conn.commit()
+        except Exception as e:
+            db.conn.rollback()
+            raise e
+
+    def _create_oplog_table(self, db: DbCtx) -> None:
+        # AUTOINCREMENT so sequence numbers are never reused after the oplog is truncated
+        db.conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self._collection_oplog_table_name} ( -- append-only log of document changes
+                seq INTEGER PRIMARY KEY AUTOINCREMENT, -- change sequence number
+                ts INTEGER NOT NULL, -- unix time in milliseconds
+                op TEXT NOT NULL, -- insert | delete
+                doc_id TEXT(36) NOT NULL, -- document uuid
+                document TEXT -- document JSON for inserts
+            )
+            """
+        )
+
+    def _append_oplog(
+        self, op: str, doc_id: ObjectId | str, document: Any, db: DbCtx
+    ) -> None:
+        """Record a change in the oplog if `DbConfig.oplog` is enabled. Call inside the transaction that makes the change.
+        Entries beyond `DbConfig.oplog_max_entries` are truncated.
+        """
+        if not self.db_config.oplog:
+            return
+        cursor = db.conn.execute(
+            f"INSERT INTO {self._collection_oplog_table_name} (ts, op, doc_id, document) VALUES (?, ?, ?, ?)",
+            (
+                int(time.time() * 1000),
+                op,
+                str(doc_id),
+                json.dumps(document) if document is not None else None,
+            ),
+        )
+        if self.db_config.oplog_max_entries is not None:
+            assert cursor.lastrowid is not None
+            db.conn.execute(
+                f"DELETE FROM {self._collection_oplog_table_name} WHERE seq <= ?",
+                (cursor.lastrowid - self.db_config.oplog_max_entries,),
+            )
+
+    def truncate_oplog(self, up_to_seq: int) -> None:
+        """Delete oplog entries with sequence number up to and including `up_to_seq`.
+        Watchers that haven't read past `up_to_seq` can no longer resume.
+        """
+        with self.db_ctx as db:
+            db.conn.execute(
+                f"DELETE FROM {self._collection_oplog_table_name} WHERE seq <= ?",
+                (up_to_seq,),
+            )
+            db.conn.commit()
+
+    def watch(
+        self,
+        resume_after: Optional[int] = None,
+        batch_size: int = 100,
+        block: bool = False,
+        max_poll_interval_ms: int = 1000,
+    ) -> Iterator[dict[str, Any]]:
+        """Iterate over changes to the collection in sequence number order.
+        Each change is a dict with `seq`, `ts`, `op` ("insert" or "delete"), `doc_id` and `document` (None for deletes).
+        Pass the `seq` of the last change processed as `resume_after` to continue from there.
+        If `resume_after` is None, changes after the latest one are returned.
+        If `block` is True, waits for new changes, polling with exponential backoff up to `max_poll_interval_ms`.
+        Otherwise stops when there are no more changes.
+        Requires `DbConfig.oplog` to be enabled for the clients that change the collection.
+        Raises:
+            ValueError: If `DbConfig.oplog` is disabled.
+            ValueError: If changes after `resume_after` have been truncated from the oplog,
+                either before watching or, when iterating, before they're read.
+        """
+        if not self.db_config.oplog:
+            raise ValueError(
+                "The oplog is disabled. Set DbConfig.oplog to record changes for watch()."
+            )
+
+        with self.db_ctx as db:
+            result = db.conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = ?",
+                (self._collection_oplog_table_name,),
+            )
+            row = result.fetchone()
+            last_seq = row[0] if row is not None else 0
+            result = db.conn.execute(
+                f"SELECT MIN(seq) FROM {self._collection_oplog_table_name}"
+            )
+            min_seq = result.fetchone()[0]
+
+        if resume_after is None:
+            resume_after = last_seq
+        else:
+            first_available_seq = min_seq if min_seq is not None else last_seq + 1
+            if resume_after + 1 < first_available_seq:
+                raise ValueError(
+                    f"Oplog entries after {resume_after} have been truncated. Oldest available is {first_available_seq}"
+                )
+
+        # the start point is resolved above, when watch() is called, not on the first next()
+        return self._watch(resume_after, batch_size, block, max_poll_interval_ms)
+
+    def _watch(
+        self,
+        resume_after: int,
+        batch_size: int,
+        block: bool,
+        max_poll_interval_ms: int,
+    ) -> Iterator[dict[str, Any]]:
+        """Generator for `watch`, starting after `resume_after`.
+        Raises:
+            ValueError: If entries are truncated from the oplog before they're read.
+        """
+        poll_interval_ms = 10
+        while True:
+            # connection is released between batches so a cold collection can be closed while idle
+            with self.db_ctx as db:
+                result = db.conn.execute(
+                    f"""
+                    SELECT seq, ts, op, doc_id, document FROM {self._collection_oplog_table_name}
+                    WHERE seq > ? ORDER BY seq LIMIT ?
+                    """,
+                    (resume_after, batch_size),
+                )
+                batch = result.fetchall()
+                if batch:
+                    first_seq = batch[0][0]
+                else:
+                    result = db.conn.execute(
+                        "SELECT seq FROM sqlite_sequence WHERE name = ?",
+                        (self._collection_oplog_table_name,),
+                    )
+                    row = result.fetchone()
+                    first_seq = row[0] + 1 if row is not None else resume_after + 1
+
+            # sequence numbers are never reused and a rolled back change doesn't use one,
+            # so a gap means the entries were truncated before they were read
+            if first_seq > resume_after + 1:
+                raise ValueError(
+                    f"Oplog entries after {resume_after} have been truncated. Oldest available is {first_seq}"
+                )
+
+            for seq, ts, op, doc_id, document in batch:
+                yield {
+                    "seq": seq,
+                    "ts": ts,
+                    "op": op,
+                    "doc_id": doc_id,
+                    "document": json.loads(document) if document is not None else None,
+                }
+                resume_after = seq
+
+            if len(batch) == batch_size:
+                continue
+            if not block:
+                return
+            if batch:
+                poll_interval_ms = 10
+            else:
+                time.sleep(poll_interval_ms / 1000)
+                poll_interval_ms = min(poll_interval_ms * 2, max_poll_interval_ms)
+
+    def _load_keys(self, db: DbCtx) -> None:
+        """(Re)load the key dictionary table into the in-memory cache."""
+        result = db.conn.execute(
+            f"SELECT id, key FROM {self._collection_keys_table_name}"
+        )
+        for key_id, key in result.fetchall():
+            self._key_ids[key] = key_id
+            self._keys[key_id] = key
+
+    def _get_key_id(self, key: str, db: DbCtx, create: bool = False) -> Optional[int]:
+        """Get the id of a key string from the key dictionary.
+        If `create` is True, a missing key is added to the dictionary. This should be called inside the insert transaction.
+        Returns:
+            Optional[int]: The key id. None if the key is not in the dictionary and `create` is False.
+        """
+        key_id = self._key_ids.get(key)
+        if key_id is not None:
+            return key_id
+
+        # the key may have been added by another connection/process since the cache was loaded
+        row = db.conn.execute(
+            f"SELECT id FROM {self._collection_keys_table_name} WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            if not create:
+                return None
+            row = db.conn.execute(
+                f"INSERT INTO {self._collection_keys_table_name} (key) VALUES (?) RETURNING id",
+                (key,),
+            ).fetchone()
+
+        key_id = row[0]
+        self._key_ids[key] = key_id
+        self._keys[key_id] = key
+        return key_id
+
+    def _get_key(self, key_id: int, db: DbCtx) -> str:
+        """Get the key string for a key id from the key dictionary."""
+        if key_id not in self._keys:
+            self._load_keys(db)
+        return self._keys[key_id]
 
     @staticmethod
     def _get_json_value_type(value) -> DbValueType:
@@ -82,33 +403,276 @@ class Collection:
             return None
         elif value_type == DbValueType.ARRAY:  # list type
             return None
+        elif value_type in (DbValueType.STRING_ZLIB, DbValueType.STRING_LZMA):
+            return str(value)
         else:
             raise ValueError(f"Unsupported JSON value type: {value_type}")
 
+    def _compress_db_value(self, value, value_type: DbValueType):
+        """Compress a string value if compression is enabled and the value is over the size threshold.
+        Returns:
+            tuple[Any, DbValueType]: The value and type to store in the database.
+        """
+        if value_type != DbValueType.STRING or self.db_config.compression is None:
+            return value, value_type
+
+        encoded = value.encode("utf-8")
+        if len(encoded) < self.db_config.compression_threshold_bytes:
+            return value, value_type
+
+        if self.db_config.compression == "zlib":
+            compressed, compressed_type = zlib.compress(encoded), DbValueType.STRING_ZLIB
+        elif self.db_config.compression == "lzma":
+            compressed, compressed_type = lzma.compress(encoded), DbValueType.STRING_LZMA
+        else:
+            raise ValueError(f"Unsupported compression: {self.db_config.compression}")
+
+        if len(compressed) >= len(encoded):  # not worth it
+            return value, value_type
+        return compressed, compressed_type
+
+    @staticmethod
+    def _register_sql_functions(conn: sqlite3.Connection) -> None:
+        """Register the SQL functions used by the collection queries on a new connection."""
+        # decompress_value(type, value) is the stored value as a string, so compressed values can be compared
+        conn.create_function(
+            "decompress_value",
+            2,
+            lambda value_type, value: Collection._decompress_db_value(
+                value, DbValueType(value_type)
+            ),
+            deterministic=True,
+        )
+
     @staticmethod
-    def _filter_dict_to_sql_where(filter: Mapping[str, Any]) -> str:
-        """Convert a dictionary filter to SQL WHERE criteria."""
+    def _decompress_db_value(value, value_type: DbValueType):
+        """Decompress a value stored by `_compress_db_value`. Values that are not compressed are returned as is."""
+        if value_type == DbValueType.STRING_ZLIB:
+            return zlib.decompress(value).decode("utf-8")
+        elif value_type == DbValueType.STRING_LZMA:
+            return lzma.decompress(value).decode("utf-8")
+        return value
+
+    def _filter_dict_to_sql_where(
+        self, filter: Mapping[str, Any], db: DbCtx
+    ) -> tuple[str, list[Any]]:
+        """Convert a dictionary filter to SQL WHERE criteria on the document data table.
+        Filter keys are matched the same way by every storage engine:
+        `_id` matches the document id. A dot separated path e.g. `specifications.capacity` matches from the document root.
+        A key without dots e.g. `capacity` matches at any depth. Arrays along the path are matched through, their
+        indexes are not part of the path. A list value matches any of its values.
+        Returns:
+            tuple[str, list[Any]]: The WHERE criteria and the parameters to bind to it.
+        """
         where_clauses = []
+        params = []
         for key, value in filter.items():
+            if key == "$text":
+                where_clauses.append(
+                    f"doc_id IN (SELECT doc_id FROM {self._collection_text_table_name} WHERE {self._collection_text_table_name} MATCH ?)"
+                )
+                params.append(self._text_search_query(value, db))
+                continue
+
+            values = self._filter_values(key, value)
+            placeholders = ", ".join("?" for _ in values)
             if key == "_id":
-                key = "doc_id"
-
-            if isinstance(value, str):
-                where_clauses.append(f"key='{key}' AND value='{value}'")
-            elif isinstance(value, ObjectId):
-                where_clauses.append(f"key='{key}' AND value='{str(value)}'")
-            elif isinstance(value, (int, float)):
-                where_clauses.append(f"key='{key}' AND value={value}")
-            elif isinstance(value, list):
-                value_list = ", ".join(
-                    f"'{v}'" if isinstance(v, str) else str(v) for v in value
+                where_clauses.append(f"doc_id IN ({placeholders})")
+                params.extend(values)
+                continue
+
+            key_id = self._get_key_id(key.split(".")[-1], db)
+            if key_id is None:  # key doesn't exist in any document so nothing can match
+                where_clauses.append("0")
+                continue
+
+            # walk up from each matching leaf value to the root, building its path. keys of array elements are
+            # indexes so they are left out of the path. the leaf key must match unless the leaf is an array element.
+            path_clause, path_params = self._filter_path_clause(key, "path")
+            where_clauses.append(
+                f"""
+                doc_id IN (
+                    WITH RECURSIVE leaf_path(doc_id, uuid, path) AS (
+                        SELECT leaf.doc_id, leaf.uuid, NULL FROM {self._collection_document_data_table_name} AS leaf
+                        LEFT JOIN {self._collection_document_data_table_name} AS parent ON parent.uuid = leaf.parent_uuid
+                        WHERE (leaf.value IN ({placeholders})
+                            OR (leaf.type IN ({DbValueType.STRING_ZLIB.value}, {DbValueType.STRING_LZMA.value}) AND decompress_value(leaf.type, leaf.value) IN ({placeholders})))
+                        AND (leaf.key_id = {key_id} OR parent.type = {DbValueType.ARRAY.value})
+                        UNION ALL
+                        SELECT node.doc_id, node.parent_uuid,
+                            CASE WHEN parent.type = {DbValueType.ARRAY.value} THEN leaf_path.path
+                            ELSE keys.key || COALESCE('.' || leaf_path.path, '') END
+                        FROM leaf_path
+                        JOIN {self._collection_document_data_table_name} AS node ON node.uuid = leaf_path.uuid
+                        JOIN {self._collection_keys_table_name} AS keys ON keys.id = node.key_id
+                        LEFT JOIN {self._collection_document_data_table_name} AS parent ON parent.uuid = node.parent_uuid
+                    )
+                    SELECT doc_id FROM leaf_path WHERE uuid = 'None' AND {path_clause}
                 )
-                where_clauses.append(f"{key} IN ({value_list})")
-            else:
+                """
+            )
+            # values are compared as stored and, for compressed strings, decompressed. so matching doesn't
+            # depend on the compression config the value was written with.
+            params.extend([*values, *values, *path_params])
+        return " AND ".join(where_clauses), params
+
+    @staticmethod
+    def _filter_values(key: str, value: Any) -> list[Any]:
+        """Get the values to bind for an equality filter. A list matches any of its values.
+        Raises:
+            ValueError: If a value is not a string, number or ObjectId.
+        """
+        values = list(value) if isinstance(value, list) else [value]
+        if not values:
+            raise ValueError(f"Filter value list for key: {key} is empty")
+        for i, v in enumerate(values):
+            if isinstance(v, ObjectId):
+                values[i] = str(v)
+            elif not isinstance(v, (str, int, float)):
                 raise ValueError(
-                    f"Unsupported filter value type: {type(value)} for key: {key}"
+                    f"Unsupported filter value type: {type(v)} for key: {key}"
+                )
+        return values
+
+    @staticmethod
+    def _filter_path_clause(key: str, path_sql: str) -> tuple[str, list[Any]]:
+        """SQL criteria that the dot separated path `path_sql` matches the filter key.
+        A key without dots matches the last key of the path, so it matches at any depth.
+        Returns:
+            tuple[str, list[Any]]: The criteria and the parameters to bind to it.
+        """
+        if "." in key:
+            return f"{path_sql} = ?", [key]
+        return f"({path_sql} = ? OR substr({path_sql}, -{len(key) + 1}) = ?)", [
+            key,
+            "." + key,
+        ]
+
+    def _text_search_query(self, text_filter: Any, db: DbCtx) -> str:
+        """Get the FTS5 query from a `$text` filter value i.e. `{"$search": "smart oven"}`.
+        Each whitespace separated term is quoted as an FTS5 string, so punctuation like `Wi-Fi` or `C++`
+        is searched for rather than parsed as query syntax. A document must match all the terms.
+        Returns:
+            str: The FTS5 query to bind to MATCH.
+        """
+        if not isinstance(text_filter, Mapping) or not isinstance(
+            text_filter.get("$search"), str
+        ):
+            raise ValueError(
+                f"Unsupported $text filter: {text_filter}. Expected {{'$search': str}}"
+            )
+        # the index may have been created by another client since the paths were loaded
+        if not self._text_index_paths and not self._load_text_index_paths(db):
+            raise ValueError(
+                f"Collection '{self.name}' has no text index. Call create_text_index() first."
+            )
+        terms = text_filter["$search"].split()
+        if not terms:
+            raise ValueError("$text $search must contain at least one term")
+        return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+    def _load_text_index_paths(self, db: DbCtx) -> set[str]:
+        """(Re)load the paths covered by the full-text index into the in-memory cache. Empty if there's no text index.
+        Writes call this inside their transaction, after taking the write lock, so paths added by another client are seen.
+        Returns:
+            set[str]: The indexed paths.
+        """
+        result = db.conn.execute(
+            f"SELECT path FROM {self._collection_text_paths_table_name}"
+        )
+        self._text_index_paths = {row[0] for row in result.fetchall()}
+        return self._text_index_paths
+
+    def _insert_text_index_entries(
+        self, doc_id: ObjectId | str, document: Any, paths: set[str], db: DbCtx
+    ) -> None:
+        """Add the string leaf values of a document at the given paths to the full-text index."""
+        stack: list[tuple[str, Any]] = [("", document)]
+        while stack:
+            path, node = stack.pop()
+            if isinstance(node, dict):
+                for key, value in node.items():
+                    stack.append((f"{path}.{key}" if path else str(key), value))
+            elif isinstance(node, list):  # array indexes are not part of the path
+                for value in node:
+                    stack.append((path, value))
+            elif isinstance(node, str) and path in paths:
+                cursor = db.conn.execute(
+                    f"INSERT INTO {self._collection_text_table_name} (value, doc_id, path) VALUES (?, ?, ?)",
+                    (node, str(doc_id), path),
                 )
-        return " AND ".join(where_clauses)
+                db.conn.execute(
+                    f"INSERT INTO {self._collection_text_docs_table_name} (text_rowid, doc_id) VALUES (?, ?)",
+                    (cursor.lastrowid, str(doc_id)),
+                )
+
+    def _delete_text_index_entries(self, doc_id: ObjectId | str, db: DbCtx) -> None:
+        """Remove a document's values from the full-text index. Call inside the delete transaction."""
+        if not self._load_text_index_paths(db):
+            return
+        # delete by rowid. doc_id is UNINDEXED in the FTS table so filtering on it would scan the whole index.
+        db.conn.execute(
+            f"""
+            DELETE FROM {self._collection_text_table_name}
+            WHERE rowid IN (SELECT text_rowid FROM {self._collection_text_docs_table_name} WHERE doc_id = ?)
+            """,
+            (str(doc_id),),
+        )
+        db.conn.execute(
+            f"DELETE FROM {self._collection_text_docs_table_name} WHERE doc_id = ?",
+            (str(doc_id),),
+        )
+
+    def create_text_index(self, paths: list[str]) -> None:
+        """Create a full-text index (SQLite FTS5) over the string values at `paths`.
+        Paths are dot separated object keys e.g. `reviews.comment`. Array indexes are not part of the path.
+        Existing documents are indexed. Calling again with more paths adds them to the index.
+        Query the index with the `$text` filter operator e.g. `{"$text": {"$search": "smart oven"}}`.
+        """
+        with self.db_ctx as db:
+            try:
+                db.conn.execute("BEGIN TRANSACTION")
+                db.conn.execute(
+                    f"""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {self._collection_text_table_name} USING fts5(
+                        value, -- string leaf value
+                        doc_id UNINDEXED, -- document uuid
+                        path UNINDEXED -- path of the value in the document
+                    )
+                    """
+                )
+                db.conn.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {self._collection_text_docs_table_name} ( -- full-text index rows of each document
+                        text_rowid INTEGER PRIMARY KEY, -- rowid in the full-text index table
+                        doc_id TEXT(36) NOT NULL -- document uuid
+                    )
+                    """
+                )
+                db.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self._collection_text_docs_table_name}_doc_id ON {self._collection_text_docs_table_name} (doc_id)"
+                )
+                self._load_text_index_paths(db)
+                new_paths = set(paths) - self._text_index_paths
+                db.conn.executemany(
+                    f"INSERT INTO {self._collection_text_paths_table_name} (path) VALUES (?)",
+                    [(path,) for path in new_paths],
+                )
+
+                if new_paths:  # index the existing documents
+                    result = db.conn.execute(
+                        f"SELECT uuid FROM {self._collection_documents_table_name}"
+                    )
+                    for (doc_id,) in result.fetchall():
+                        self._insert_text_index_entries(
+                            doc_id, self._find_one(doc_id, db), new_paths, db
+                        )
+
+                db.conn.commit()
+                self._text_index_paths |= new_paths
+            except Exception as e:
+                db.conn.rollback()
+                raise e
 
     def insert_one(
         self, document: Mapping[str, Any] | str, uuid: Optional[ObjectId] = None
@@ -135,20 +699,21 @@ class Collection:
                 child_uuid = ObjectId()
                 _type = self._get_json_value_type(value)
                 _value = self._map_json_value_type_to_db_value(value, _type)
+                _db_value, _db_type = self._compress_db_value(_value, _type)
                 # print("key: ", key, "_type: ", _type, "_value: ", _value)
 
                 db.conn.execute(
                     f"""
-                    INSERT INTO {self._collection_document_data_table_name} (uuid, doc_id, parent_uuid, key, type, value)
+                    INSERT INTO {self._collection_document_data_table_name} (uuid, doc_id, parent_uuid, key_id, type, value)
                     VALUES (?, ?, ?, ?, ?, ?)
                     """,
                     (
                         str(child_uuid),
                         str(doc_id),
                         str(parent_uuid),
-                        key,
-                        _type.value,
-                        _value,
+                        self._get_key_id(str(key), db, create=True),
+                        _db_type.value,
+                        _db_value,
                     ),  # Assuming type 1 for dict
                 )
                 if _value is None:  # not leaf node, so keep recursing
@@ -173,10 +738,21 @@ class Collection:
 
                 recurse_and_insert(doc_data, None, db)
 
+                text_index_paths = self._load_text_index_paths(db)
+                if text_index_paths:
+                    self._insert_text_index_entries(
+                        doc_id, doc_data, text_index_paths, db
+                    )
+
+                self._append_oplog("insert", doc_id, doc_data, db)
+
                 db.conn.commit()
                 return doc_id
             except Exception as e:
                 db.conn.rollback()
+                # keys added in this transaction were rolled back and their ids may be reused
+                self._key_ids.clear()
+                self._keys.clear()
                 raise e
 
     def find_one(self, uuid: ObjectId) -> Any:
@@ -185,14 +761,28 @@ class Collection:
             Any: The document.
         """
         with self.db_ctx as db:
-            result = db.conn.execute(
-                f"""
-                SELECT uuid, doc_id, parent_uuid, key, type, value FROM {self._collection_document_data_table_name}
-                WHERE doc_id = ?
-                """,
-                (str(uuid),),
+            return self._find_one(uuid, db)
+
+    def _find_one(self, uuid: ObjectId | str, db: DbCtx) -> Any:
+        """Get a document from the collection using an open db context."""
+        result = db.conn.execute(
+            f"""
+            SELECT uuid, doc_id, parent_uuid, key_id, type, value FROM {self._collection_document_data_table_name}
+            WHERE doc_id = ?
+            """,
+            (str(uuid),),
+        )
+        all_nodes_data = [
+            (
+                node[0],
+                node[1],
+                node[2],
+                self._get_key(node[3], db),
+                node[4],
+                self._decompress_db_value(node[5], DbValueType(node[4])),
             )
-            all_nodes_data = result.fetchall()
+            for node in result.fetchall()
+        ]
 
         # print(all_nodes_data)
         # print("all nodes len: ", len(all_nodes_data))
@@ -248,13 +838,61 @@ class Collection:
                             parent_node[key] = leaf_value
         return output_doc
 
+    def find(self, filter: Mapping[str, Any]) -> list[Any]:
+        """Find documents in the collection that match the filter.
+        With a `$text` filter, documents are ranked by bm25 relevance, best match first.
+        Returns:
+            list[Any]: The matching documents.
+        """
+        with self.db_ctx as db:
+            if "$text" in filter:
+                query = self._text_search_query(filter["$text"], db)
+                other_filter = {k: v for k, v in filter.items() if k != "$text"}
+                other_where, other_params = "", []
+                if other_filter:
+                    where, other_params = self._filter_dict_to_sql_where(
+                        other_filter, db
+                    )
+                    other_where = f"AND doc_id IN (SELECT doc_id FROM {self._collection_document_data_table_name} WHERE {where})"
+                # rank is bm25() and lower is a better match. a document ranks by its best matching value.
+                result = db.conn.execute(
+                    f"""
+                    SELECT doc_id FROM {self._collection_text_table_name}
+                    WHERE {self._collection_text_table_name} MATCH ? {other_where}
+                    AND doc_id IN (SELECT uuid FROM {self._collection_documents_table_name})
+                    ORDER BY rank
+                    """,
+                    [query, *other_params],
+                )
+                doc_ids = list(dict.fromkeys(row[0] for row in result.fetchall()))
+            else:
+                where, params = self._filter_dict_to_sql_where(filter, db)
+                if where:
+                    result = db.conn.execute(
+                        f"SELECT DISTINCT doc_id FROM {self._collection_document_data_table_name} WHERE {where}",
+                        params,
+                    )
+                else:  # an empty filter matches every document
+                    result = db.conn.execute(
+                        f"SELECT uuid FROM {self._collection_documents_table_name}"
+                    )
+                doc_ids = [row[0] for row in result.fetchall()]
+            return [self._find_one(doc_id, db) for doc_id in doc_ids]
+
     def count_documents(self, filter: Mapping[str, Any]) -> int:
         """Count documents in the collection that match the filter."""
 
         with self.db_ctx as db:
-            result = db.conn.execute(
-                f"SELECT DISTINCT COUNT(doc_id) FROM {self._collection_document_data_table_name} WHERE {self._filter_dict_to_sql_where(filter)}",
-            )
+            where, params = self._filter_dict_to_sql_where(filter, db)
+            if where:
+                result = db.conn.execute(
+                    f"SELECT COUNT(DISTINCT doc_id) FROM {self._collection_document_data_table_name} WHERE {where}",
+                    params,
+                )
+            else:  # an empty filter matches every document
+                result = db.conn.execute(
+                    f"SELECT COUNT(*) FROM {self._collection_documents_table_name}"
+                )
             count = result.fetchone()[0]
             # print("count: ", self._filter_dict_to_sql_where(filter))
         return int(count)
@@ -265,17 +903,31 @@ class Collection:
     def delete_one(self, filter: Mapping[str, Any]) -> None:
         """Delete a document from the collection."""
         with self.db_ctx as db:
-            result = db.conn.execute(
-                f"SELECT doc_id FROM {self._collection_document_data_table_name} WHERE {self._filter_dict_to_sql_where(filter)}"
-            )
-            doc_id = result.fetchone()[0]
+            try:
+                db.conn.execute("BEGIN TRANSACTION")
+                where, params = self._filter_dict_to_sql_where(filter, db)
+                if where:
+                    result = db.conn.execute(
+                        f"SELECT doc_id FROM {self._collection_document_data_table_name} WHERE {where}",
+                        params,
+                    )
+                else:  # an empty filter matches every document
+                    result = db.conn.execute(
+                        f"SELECT uuid FROM {self._collection_documents_table_name} LIMIT 1"
+                    )
+                doc_id = result.fetchone()[0]
 
-            db.conn.execute(
-                f"DELETE FROM {self._collection_document_data_table_name} WHERE doc_id = ?",
-                (doc_id,),
-            )
-            db.conn.execute(
-                f"DELETE FROM {self._collection_documents_table_name} WHERE uuid = ?",
-                (doc_id,),
-            )
-            db.conn.commit()
+                db.conn.execute(
+                    f"DELETE FROM {self._collection_document_data_table_name} WHERE doc_id = ?",
+                    (doc_id,),
+                )
+                db.conn.execute(
+                    f"DELETE FROM {self._collection_documents_table_name} WHERE uuid = ?",
+                    (doc_id,),
+                )
+                self._delete_text_index_entries(doc_id, db)
+                self._append_oplog("delete", doc_id, None, db)
+                db.conn.commit()
+            except Exception as e:
+                db.conn.rollback()
+                raise e
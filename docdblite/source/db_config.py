@@ -1,4 +1,6 @@
 
+from typing import Literal, Optional
+
 from attr import dataclass
 
 
@@ -16,3 +18,21 @@ class DbConfig:
 
     timeout_ms: int = 5000
     """Busy/connection timeout in milliseconds. Otherwise SQLite will return busy immediately."""
+
+    max_open_collections: Optional[int] = None
+    """Maximum number of collection databases with an open connection pool. Least recently used collections are closed over this limit.
+    None derives it from the process open file limit (RLIMIT_NOFILE) and `connection_pool_size`, using at most half of the limit."""
+
+    compression: Optional[Literal["zlib", "lzma"]] = None
+    """Compress string values using this standard library codec. None disables compression."""
+
+    compression_threshold_bytes: int = 256
+    """String values at or above this size (UTF-8 encoded) are compressed when `compression` is set."""
+
+    oplog: bool = False
+    """Record inserts and deletes in each collection's oplog, for `Collection.watch`.
+    Off by default because each insert entry holds a copy of the document JSON, so the oplog can take as much space
+    as up to `oplog_max_entries` documents on top of the collection data."""
+
+    oplog_max_entries: Optional[int] = 100_000
+    """Number of most recent changes kept in each collection's oplog. None keeps all changes."""
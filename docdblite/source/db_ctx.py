@@ -1,7 +1,8 @@
 import os
 import sqlite3
 from queue import Queue
-from threading import Lock
+from threading import Lock, local
+from typing import Callable, Optional
 
 from source.db_config import DbConfig
 
@@ -18,35 +19,64 @@ class DbCtx:
       ```
     """
 
-    conn: sqlite3.Connection
-    """Connection from pool on entry, returned to pool on exit."""
-
-    def __init__(self, db_config: DbConfig, database_name: str):
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection from pool on entry, returned to pool on exit. Per thread, so threads can share a context."""
+        return self._local.conn
+
+    def __init__(
+        self,
+        db_config: DbConfig,
+        database_name: str,
+        on_use: Optional[Callable[["DbCtx"], None]] = None,
+        on_connect: Optional[Callable[[sqlite3.Connection], None]] = None,
+    ):
+        """`on_use` is called each time a connection is taken from the pool, after the pool is opened.
+        `on_connect` is called with each new connection when the pool is opened, e.g. to register SQL functions.
+        """
         self.db_cfg = db_config
-        db_path = os.path.join(
+        self.db_path = os.path.join(
             self.db_cfg.dir, self._build_database_filename(database_name)
         )
 
-        # Ensure the directory exists
-        os.makedirs(self.db_cfg.dir, exist_ok=True)
-
         self.pool_size = self.db_cfg.connection_pool_size
-        self.pool = Queue(maxsize=self.pool_size)
+        self.pool: Optional[Queue] = None
         self.lock = Lock()
+        self._checked_out = 0
+        """Number of connections currently taken from the pool."""
+        self.on_use = on_use
+        self.on_connect = on_connect
+        self._local = local()
 
-        # Initialize the connection pool
+        # the connection pool is opened lazily on first use. see `_open()`
+
+        # self.conn = self.get_connection()
+        # self.c = self.conn.cursor()
+
+    def _open(self) -> Queue:
+        """Initialize the connection pool. Call with `self.lock` held."""
+        # Ensure the directory exists
+        os.makedirs(self.db_cfg.dir, exist_ok=True)
+
+        pool = Queue(maxsize=self.pool_size)
         for _ in range(self.pool_size):
             conn = sqlite3.connect(
-                database=db_path,
+                database=self.db_path,
                 timeout=self.db_cfg.timeout_ms,
                 detect_types=sqlite3.PARSE_DECLTYPES,
                 cached_statements=self.db_cfg.cached_statements,
+                check_same_thread=False,
             )
             conn.execute("PRAGMA journal_mode=WAL;")
-            self.pool.put(conn)
+            if self.on_connect is not None:
+                self.on_connect(conn)
+            pool.put(conn)
+        return pool
 
-        # self.conn = self.get_connection()
-        # self.c = self.conn.cursor()
+    @property
+    def is_open(self) -> bool:
+        """True if the connection pool is open."""
+        return self.pool is not None
 
     def _build_database_filename(self, database_name: str) -> str:
         return f"{database_name}.sqlite"
@@ -58,19 +88,29 @@ class DbCtx:
         connection.commit()
 
     def get_connection(self) -> sqlite3.Connection:
-        """Get a connection from the pool."""
+        """Get a connection from the pool. Opens the pool if it's not open."""
         with self.lock:
-            return self.pool.get()
+            if self.pool is None:
+                self.pool = self._open()
+            pool = self.pool
+            self._checked_out += 1
+        # called after the connection is counted as checked out, so the pool can't be closed by a cache eviction
+        # before it's used. not called with self.lock held because the cache locks other contexts.
+        if self.on_use is not None:
+            self.on_use(self)
+        return pool.get()
 
     def release_connection(self, connection: sqlite3.Connection) -> None:
         """Release a connection back to the pool.
         Call this immediately after you are done with the connection. i.e. commit or rollback.
         """
         with self.lock:
+            assert self.pool is not None
             self.pool.put(connection)
+            self._checked_out -= 1
 
     def __enter__(self):
-        self.conn = self.get_connection()
+        self._local.conn = self.get_connection()
         # self.c = self.conn.cursor()
         return self
 
@@ -79,7 +119,28 @@ class DbCtx:
         self.release_connection(self.conn)
 
     def close(self):
-        """Close all connections in the pool."""
+        """Close all connections in the pool. Waits for connections in use to be released."""
+        with self.lock:
+            pool = self.pool
+        if pool is None:
+            return
         for _ in range(self.pool_size):
-            conn = self.pool.get()
+            conn = pool.get()
             conn.close()
+        with self.lock:
+            if self.pool is pool:
+                self.pool = None
+
+    def close_if_idle(self) -> bool:
+        """Close all connections in the pool if none are in use. The pool is reopened on next use.
+        Returns:
+            bool: True if the pool is closed.
+        """
+        with self.lock:
+            if self._checked_out:
+                return False
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            while not pool.empty():
+                pool.get_nowait().close()
+        return True
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from threading import Lock
+
+from source.db_ctx import DbCtx
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+FDS_PER_CONNECTION = 3
+"""File descriptors a WAL mode connection can hold. The database, -wal and -shm files."""
+
+DEFAULT_OPEN_FILE_LIMIT = 512
+"""Open file limit assumed when it can't be read from the OS."""
+
+
+def default_max_open(connection_pool_size: int) -> int:
+    """Number of connection pools that can be open using at most half of the process open file limit."""
+    open_file_limit = DEFAULT_OPEN_FILE_LIMIT
+    if resource is not None:
+        soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft_limit != resource.RLIM_INFINITY:
+            open_file_limit = soft_limit
+    return max(1, (open_file_limit // 2) // (connection_pool_size * FDS_PER_CONNECTION))
+
+
+class DbCtxCache:
+    """LRU of open database contexts.
+
+    Keeps at most `max_open` connection pools open. When the limit is exceeded the least recently used
+    idle contexts are closed. A closed context reopens on next use, so eviction is transparent to callers.
+    Contexts with connections in use are not closed, so the limit can be exceeded temporarily.
+    """
+
+    def __init__(self, max_open: int):
+        self.max_open = max_open
+        self._open: OrderedDict[int, DbCtx] = OrderedDict()
+        self.lock = Lock()
+
+    def touch(self, db_ctx: DbCtx) -> None:
+        """Mark a context as most recently used and close cold contexts over the limit.
+        Called by `DbCtx` each time a connection is taken, so a reopened context is counted again.
+        """
+        with self.lock:
+            self._open[id(db_ctx)] = db_ctx
+            self._open.move_to_end(id(db_ctx))
+
+            for key, cold_ctx in list(self._open.items()):
+                if len(self._open) <= self.max_open:
+                    break
+                if cold_ctx is db_ctx:
+                    continue
+                if not cold_ctx.is_open or cold_ctx.close_if_idle():
+                    del self._open[key]
+
+    def close_all(self) -> None:
+        """Close all contexts in the cache. Waits for connections in use to be released."""
+        with self.lock:
+            open_ctxs = list(self._open.values())
+            self._open.clear()
+        for db_ctx in open_ctxs:
+            db_ctx.close()
+
+    def __len__(self) -> int:
+        return len(self._open)
@@ -10,4 +10,6 @@ class DbValueType(Enum):
     INTEGER = 25
     FLOAT = 30
     BOOLEAN = 35
-    DATETIME = 40
\ No newline at end of file
+    DATETIME = 40
+    STRING_ZLIB = 45  # string compressed with zlib, stored as BLOB
+    STRING_LZMA = 50  # string compressed with lzma, stored as BLOB
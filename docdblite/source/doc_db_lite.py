@@ -3,7 +3,10 @@ from typing import Optional, Self
 from source.collection import Collection
 from source.db_config import DbConfig
 from source.db_ctx import DbCtx
+from source.db_ctx_cache import DbCtxCache, default_max_open
+from source.json_collection import JsonCollection
 from source.object_id import ObjectId
+from source.storage_engine import StorageEngine
 
 
 class DocDbLite:
@@ -12,38 +15,119 @@ class DocDbLite:
     def __init__(self, config: Optional[DbConfig] = None):
         self.db_config = config or DbConfig()
         self.system_db_ctx = DbCtx(self.db_config, "system")
-        self._create_collections_table()
         self._collections_table_name = "collections"
+        self._create_collections_table()
+        self._db_ctx_cache = DbCtxCache(
+            self.db_config.max_open_collections
+            or default_max_open(self.db_config.connection_pool_size)
+        )
         self.collections = {}
 
     def _create_collections_table(self):
         with self.system_db_ctx as sys_db:
             sys_db.conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS collections (
+                f"""
+                CREATE TABLE IF NOT EXISTS {self._collections_table_name} (
                     uuid TEXT PRIMARY KEY, -- UUID
-                    name TEXT NOT NULL
+                    name TEXT NOT NULL,
+                    storage_engine TEXT NOT NULL DEFAULT 'nodes' -- StorageEngine value
+                )
+                """
+            )
+            columns = [
+                row[1]
+                for row in sys_db.conn.execute(
+                    f"PRAGMA table_info({self._collections_table_name})"
+                ).fetchall()
+            ]
+            if "storage_engine" not in columns:  # catalogs created before storage engines
+                sys_db.conn.execute(
+                    f"ALTER TABLE {self._collections_table_name} ADD COLUMN storage_engine TEXT NOT NULL DEFAULT 'nodes'"
                 )
+            # catalogs created before names were unique can have a row per process start. keep the first.
+            sys_db.conn.execute(
+                f"""
+                DELETE FROM {self._collections_table_name}
+                WHERE rowid NOT IN (SELECT MIN(rowid) FROM {self._collections_table_name} GROUP BY name)
                 """
             )
+            sys_db.conn.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {self._collections_table_name}_name_idx ON {self._collections_table_name} (name)"
+            )
             sys_db.conn.commit()
 
     collections: dict[str, Collection]
+    """Collections opened by this client, by name. Collections open their database lazily on first use."""
 
-    def add_collection(self: Self, name) -> Collection:
+    def add_collection(
+        self: Self, name, storage_engine: Optional[StorageEngine] = None
+    ) -> Collection:
+        """Get a collection, adding it to the catalog if it doesn't exist.
+        `storage_engine` is used for a new collection, defaulting to `StorageEngine.NODES`.
+        Raises:
+            ValueError: If the collection exists with a different storage engine.
+        """
+        if name not in self.collections:
+            with self.system_db_ctx as sys_db:
+                sys_db.conn.execute(
+                    f"""
+                    INSERT OR IGNORE INTO {self._collections_table_name} (uuid, name, storage_engine)
+                    VALUES (?, ?, ?)
+                    """,
+                    (
+                        str(ObjectId()),
+                        name,
+                        (storage_engine or StorageEngine.NODES).value,
+                    ),
+                )
+                sys_db.conn.commit()
+
+        collection = self.get_collection(name)
+        if storage_engine is not None and collection.storage_engine != storage_engine:
+            raise ValueError(
+                f"Collection '{name}' exists with storage engine '{collection.storage_engine.value}'"
+            )
+        return collection
+
+    def get_collection(self: Self, name) -> Collection:
+        """Get a collection from the catalog.
+        Raises:
+            ValueError: If the collection doesn't exist.
+        """
         if name in self.collections:
             return self.collections[name]
 
-        # Create a new collection
         with self.system_db_ctx as sys_db:
-            sys_db.conn.execute(
-                f"""
-                INSERT INTO {self._collections_table_name} (uuid, name)
-                VALUES (?, ?)
-                """,
-                (str(ObjectId()), name),
+            result = sys_db.conn.execute(
+                f"SELECT storage_engine FROM {self._collections_table_name} WHERE name = ?",
+                (name,),
             )
-            sys_db.conn.commit()
+            row = result.fetchone()
+
+        if row is None:
+            raise ValueError(f"Collection '{name}' does not exist")
+        return self._get_or_create_collection(name, StorageEngine(row[0]))
+
+    def list_collections(self: Self) -> list[str]:
+        """List the names of the collections in the catalog."""
+        with self.system_db_ctx as sys_db:
+            result = sys_db.conn.execute(
+                f"SELECT name FROM {self._collections_table_name} ORDER BY name"
+            )
+            return [row[0] for row in result.fetchall()]
+
+    def _get_or_create_collection(
+        self: Self, name, storage_engine: StorageEngine
+    ) -> Collection:
+        collection_class = (
+            JsonCollection if storage_engine == StorageEngine.JSON else Collection
+        )
+        # setdefault keeps a single Collection per name if two threads race here
+        return self.collections.setdefault(
+            name, collection_class(self.db_config, name, self._db_ctx_cache)
+        )
 
-        self.collections[name] = Collection(self.db_config, name)
-        return self.collections[name]
\ No newline at end of file
+    def close(self: Self) -> None:
+        """Close the collection and system databases."""
+        self._db_ctx_cache.close_all()
+        self.system_db_ctx.close()
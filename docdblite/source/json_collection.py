@@ -0,0 +1,310 @@
+import json
+import re
+import sqlite3
+from typing import Any, Mapping, Optional
+
+from source.collection import Collection
+from source.db_config import DbConfig
+from source.db_ctx import DbCtx
+from source.db_ctx_cache import DbCtxCache
+from source.object_id import ObjectId
+from source.storage_engine import StorageEngine
+
+
+class JsonCollection(Collection):
+    """Collection that stores each document as a single JSON column using the SQLite JSON1 functions.
+
+    Reads and writes are a single row, which suits read-mostly collections that load whole documents.
+    Filters match the same documents as the nodes engine, see `Collection._filter_dict_to_sql_where`.
+    `create_index(path)` exposes a dot separated path as a generated column with an index on it.
+    Key interning and value compression don't apply, the document is stored as JSON text.
+    """
+
+    storage_engine = StorageEngine.JSON
+
+    def __init__(
+        self,
+        db_config: DbConfig,
+        name: str,
+        db_ctx_cache: Optional[DbCtxCache] = None,
+    ):
+        super().__init__(db_config, name, db_ctx_cache)
+        self._collection_indexes_table_name = f"{self.name}_indexes"
+
+        # in-memory cache of the indexes table. path -> generated column name
+        self._indexed_columns: dict[str, str] = {}
+
+    def _create_tables(self, db_ctx: DbCtx) -> None:
+        # each collection is database file with a table named after the collection
+        with db_ctx as db:
+            db.conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self._collection_documents_table_name} ( -- collection of documents table
+                    uuid TEXT(36) PRIMARY KEY, -- document id
+                    doc TEXT NOT NULL -- document JSON
+                )
+                """
+            )
+            db.conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self._collection_indexes_table_name} ( -- paths exposed as indexed generated columns
+                    path TEXT PRIMARY KEY, -- dot separated object keys
+                    column_name TEXT NOT NULL UNIQUE -- generated column on the documents table
+                )
+                """
+            )
+            db.conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self._collection_text_paths_table_name} ( -- paths covered by the full-text index
+                    path TEXT PRIMARY KEY -- dot separated object keys. array indexes are not part of the path.
+                )
+                """
+            )
+            self._create_oplog_table(db)
+            db.conn.commit()
+            result = db.conn.execute(
+                f"SELECT path, column_name FROM {self._collection_indexes_table_name}"
+            )
+            self._indexed_columns = dict(result.fetchall())
+            self._load_text_index_paths(db)
+
+    @staticmethod
+    def _json_path(path: str) -> str:
+        """Convert a dot separated path to a JSON1 path e.g. `a.b` to `$."a"."b"`."""
+        segments = "".join(f'."{segment}"' for segment in path.split("."))
+        return "$" + segments.replace("'", "''")
+
+    def _path_to_sql(self, path: str) -> str:
+        """SQL expression for the value at `path` if it's a leaf value reached without arrays, otherwise NULL."""
+        json_path = self._json_path(path)
+        return f"CASE WHEN json_type(doc, '{json_path}') IN ('object', 'array') THEN NULL ELSE json_extract(doc, '{json_path}') END"
+
+    def create_index(self, path: str) -> None:
+        """Expose the value at `path` as a generated column with an index on it, so filters on `path` use the index.
+        Only dot separated paths use the index. A key without dots matches at any depth, which the column can't cover.
+        """
+        column_name = "idx_" + re.sub(r"[^0-9a-zA-Z_]", "_", path)
+
+        with self.db_ctx as db:
+            try:
+                # IMMEDIATE takes the write lock first, so the indexes read below can't change before the ALTER TABLE
+                db.conn.execute("BEGIN IMMEDIATE TRANSACTION")
+                # re-read because another process may have added indexes since they were loaded
+                result = db.conn.execute(
+                    f"SELECT path, column_name FROM {self._collection_indexes_table_name}"
+                )
+                indexed_columns = dict(result.fetchall())
+
+                if path not in indexed_columns:
+                    if column_name in indexed_columns.values():
+                        raise ValueError(
+                            f"Index column '{column_name}' for path '{path}' is already used by another path"
+                        )
+                    # only VIRTUAL generated columns can be added to an existing table
+                    db.conn.execute(
+                        f"""
+                        ALTER TABLE {self._collection_documents_table_name}
+                        ADD COLUMN {column_name} GENERATED ALWAYS AS ({self._path_to_sql(path)}) VIRTUAL
+                        """
+                    )
+                    db.conn.execute(
+                        f"CREATE INDEX {self._collection_documents_table_name}_{column_name} ON {self._collection_documents_table_name} ({column_name})"
+                    )
+                    db.conn.execute(
+                        f"INSERT INTO {self._collection_indexes_table_name} (path, column_name) VALUES (?, ?)",
+                        (path, column_name),
+                    )
+                    indexed_columns[path] = column_name
+                db.conn.commit()
+            except Exception as e:
+                db.conn.rollback()
+                raise e
+
+        self._indexed_columns = indexed_columns
+
+    def _filter_dict_to_sql_where(
+        self, filter: Mapping[str, Any], db: DbCtx
+    ) -> tuple[str, list[Any]]:
+        """Convert a dictionary filter to SQL WHERE criteria on the documents table.
+        Filter keys match the same way as `Collection._filter_dict_to_sql_where`.
+        Returns:
+            tuple[str, list[Any]]: The WHERE criteria and the parameters to bind to it.
+        """
+        where_clauses = []
+        params = []
+        for key, value in filter.items():
+            if key == "$text":
+                where_clauses.append(
+                    f"uuid IN (SELECT doc_id FROM {self._collection_text_table_name} WHERE {self._collection_text_table_name} MATCH ?)"
+                )
+                params.append(self._text_search_query(value, db))
+                continue
+
+            values = self._filter_values(key, value)
+            placeholders = ", ".join("?" for _ in values)
+            if key == "_id":
+                where_clauses.append(f"uuid IN ({placeholders})")
+                params.extend(values)
+                continue
+
+            # search the leaf values under the first key of a path, or the whole document for a key without dots.
+            # the leaf key must match unless the leaf is an array element, whose key is its index.
+            tree_root = f", '{self._json_path(key.split('.')[0])}'" if "." in key else ""
+            path_clause, path_params = self._filter_path_clause(
+                key, "json_filter_path(node.fullkey)"
+            )
+            tree_clause = f"""
+                EXISTS (
+                    SELECT 1 FROM json_tree(doc{tree_root}) AS node
+                    WHERE node.atom IN ({placeholders}) AND node.type NOT IN ('object', 'array')
+                    AND (node.key = ? OR typeof(node.key) = 'integer') AND {path_clause}
+                )
+                """
+            tree_params = [*values, key.split(".")[-1], *path_params]
+
+            column_name = self._indexed_columns.get(key)
+            if column_name is not None and "." in key:
+                # the generated column is the value at the path if it's reached without arrays, otherwise NULL.
+                # both sides of the OR can use the index on it.
+                where_clauses.append(
+                    f"({column_name} IN ({placeholders}) OR ({column_name} IS NULL AND {tree_clause}))"
+                )
+                params.extend([*values, *tree_params])
+            else:
+                where_clauses.append(tree_clause)
+                params.extend(tree_params)
+        return " AND ".join(where_clauses), params
+
+    @staticmethod
+    def _where_sql(where: str) -> str:
+        """WHERE clause for criteria from `_filter_dict_to_sql_where`. An empty filter matches every document."""
+        return f"WHERE {where}" if where else ""
+
+    @staticmethod
+    def _register_sql_functions(conn: sqlite3.Connection) -> None:
+        """Register the SQL functions used by the collection queries on a new connection."""
+        Collection._register_sql_functions(conn)
+        # json_filter_path(fullkey) is the dot separated path of a json_tree() row without array indexes
+        conn.create_function(
+            "json_filter_path", 1, JsonCollection._filter_path, deterministic=True
+        )
+
+    @staticmethod
+    def _filter_path(fullkey: str) -> str:
+        """Convert a JSON1 path to a dot separated path without array indexes e.g. `$.a[0]."b c"` to `a.b c`."""
+        segments = []
+        for match in re.finditer(r'\.("(?:[^"\\]|\\.)*"|[^.\[]+)', fullkey):
+            segment = match.group(1)
+            segments.append(json.loads(segment) if segment.startswith('"') else segment)
+        return ".".join(segments)
+
+    def insert_one(
+        self, document: Mapping[str, Any] | str, uuid: Optional[ObjectId] = None
+    ) -> ObjectId:
+        """Add a document to the collection.
+        Returns:
+            ObjectId: The uuid of the newly created document.
+        """
+        doc_id = uuid or ObjectId()
+        doc_data = json.loads(document) if isinstance(document, str) else document
+
+        with self.db_ctx as db:
+            try:
+                db.conn.execute("BEGIN TRANSACTION")
+                db.conn.execute(
+                    f"INSERT INTO {self._collection_documents_table_name} (uuid, doc) VALUES (?, ?)",
+                    (str(doc_id), json.dumps(doc_data)),
+                )
+
+                text_index_paths = self._load_text_index_paths(db)
+                if text_index_paths:
+                    self._insert_text_index_entries(
+                        doc_id, doc_data, text_index_paths, db
+                    )
+
+                self._append_oplog("insert", doc_id, doc_data, db)
+
+                db.conn.commit()
+                return doc_id
+            except Exception as e:
+                db.conn.rollback()
+                raise e
+
+    def _find_one(self, uuid: ObjectId | str, db: DbCtx) -> Any:
+        """Get a document from the collection using an open db context."""
+        result = db.conn.execute(
+            f"SELECT doc FROM {self._collection_documents_table_name} WHERE uuid = ?",
+            (str(uuid),),
+        )
+        row = result.fetchone()
+        return json.loads(row[0]) if row is not None else {}
+
+    def find(self, filter: Mapping[str, Any]) -> list[Any]:
+        """Find documents in the collection that match the filter.
+        With a `$text` filter, documents are ranked by bm25 relevance, best match first.
+        Returns:
+            list[Any]: The matching documents.
+        """
+        with self.db_ctx as db:
+            if "$text" in filter:
+                query = self._text_search_query(filter["$text"], db)
+                other_filter = {k: v for k, v in filter.items() if k != "$text"}
+                other_where, other_params = "", []
+                if other_filter:
+                    where, other_params = self._filter_dict_to_sql_where(
+                        other_filter, db
+                    )
+                    other_where = f"AND doc_id IN (SELECT uuid FROM {self._collection_documents_table_name} WHERE {where})"
+                # rank is bm25() and lower is a better match. a document ranks by its best matching value.
+                result = db.conn.execute(
+                    f"""
+                    SELECT doc_id FROM {self._collection_text_table_name}
+                    WHERE {self._collection_text_table_name} MATCH ? {other_where}
+                    AND doc_id IN (SELECT uuid FROM {self._collection_documents_table_name})
+                    ORDER BY rank
+                    """,
+                    [query, *other_params],
+                )
+                doc_ids = list(dict.fromkeys(row[0] for row in result.fetchall()))
+                return [self._find_one(doc_id, db) for doc_id in doc_ids]
+
+            where, params = self._filter_dict_to_sql_where(filter, db)
+            result = db.conn.execute(
+                f"SELECT doc FROM {self._collection_documents_table_name} {self._where_sql(where)}",
+                params,
+            )
+            return [json.loads(row[0]) for row in result.fetchall()]
+
+    def count_documents(self, filter: Mapping[str, Any]) -> int:
+        """Count documents in the collection that match the filter."""
+        with self.db_ctx as db:
+            where, params = self._filter_dict_to_sql_where(filter, db)
+            result = db.conn.execute(
+                f"SELECT COUNT(*) FROM {self._collection_documents_table_name} {self._where_sql(where)}",
+                params,
+            )
+            count = result.fetchone()[0]
+        return int(count)
+
+    def delete_one(self, filter: Mapping[str, Any]) -> None:
+        """Delete a document from the collection."""
+        with self.db_ctx as db:
+            try:
+                db.conn.execute("BEGIN TRANSACTION")
+                where, params = self._filter_dict_to_sql_where(filter, db)
+                result = db.conn.execute(
+                    f"SELECT uuid FROM {self._collection_documents_table_name} {self._where_sql(where)} LIMIT 1",
+                    params,
+                )
+                doc_id = result.fetchone()[0]
+
+                db.conn.execute(
+                    f"DELETE FROM {self._collection_documents_table_name} WHERE uuid = ?",
+                    (doc_id,),
+                )
+                self._delete_text_index_entries(doc_id, db)
+                self._append_oplog("delete", doc_id, None, db)
+                db.conn.commit()
+            except Exception as e:
+                db.conn.rollback()
+                raise e
@@ -0,0 +1,11 @@
+from enum import Enum
+
+
+class StorageEngine(Enum):
+    """How a collection stores its documents. Chosen per collection when it's added to the catalog."""
+
+    NODES = "nodes"
+    """A row per JSON node. See `Collection`."""
+
+    JSON = "json"
+    """A row per document with the document as a JSON column. See `JsonCollection`."""
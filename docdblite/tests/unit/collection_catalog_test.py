@@ -0,0 +1,89 @@
+"""Check the persistent collection catalog, lazy opening of collections and the open collection limit."""
+
+import os
+import resource
+import threading
+
+import pytest
+from source.db_config import DbConfig
+
+from docdblite import DocDbLite
+
+
+@pytest.mark.unit
+def test_catalog_persists_unique_collection_names(tmp_path) -> None:
+    """Add collections from two clients and check each name is in the catalog once."""
+    db = DocDbLite(DbConfig(str(tmp_path)))
+    db.add_collection("products")
+    db.add_collection("reviews")
+    db.close()
+
+    db = DocDbLite(DbConfig(str(tmp_path)))
+    db.add_collection("products")
+
+    assert db.list_collections() == ["products", "reviews"]
+    assert db.get_collection("reviews") is db.get_collection("reviews")
+    with pytest.raises(ValueError):
+        db.get_collection("missing")
+    db.close()
+
+
+@pytest.mark.unit
+def test_collections_open_lazily_within_open_limit(tmp_path) -> None:
+    """Collections don't create their database until used and cold collections are closed over the limit."""
+    db = DocDbLite(DbConfig(str(tmp_path), max_open_collections=2))
+
+    collections = [db.add_collection(f"collection{i}") for i in range(4)]
+    assert not os.path.exists(tmp_path / "collection0.sqlite")
+
+    doc_ids = [c.insert_one({"n": i}) for i, c in enumerate(collections)]
+    assert len(db._db_ctx_cache) == 2
+    assert [c._db_ctx.is_open for c in collections] == [False, False, True, True]
+
+    # closed collections reopen on use
+    assert [c.find_one(doc_id) for c, doc_id in zip(collections, doc_ids)] == [
+        {"n": i} for i in range(4)
+    ]
+    db.close()
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_default_open_limit_stays_within_open_file_limit(tmp_path) -> None:
+    """With the default limit, using many collections keeps open files within half the process limit."""
+    soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    db = DocDbLite(DbConfig(str(tmp_path)))
+    fds_before = len(os.listdir("/proc/self/fd"))
+
+    for i in range(db._db_ctx_cache.max_open + 5):
+        db.add_collection(f"collection{i}").insert_one({"n": i})
+
+    assert len(db._db_ctx_cache) <= db._db_ctx_cache.max_open
+    assert len(os.listdir("/proc/self/fd")) - fds_before <= soft_limit // 2
+    db.close()
+
+
+@pytest.mark.unit
+def test_concurrent_use_keeps_open_pools_in_cache(tmp_path) -> None:
+    """Collections used from many threads create one context each and every open pool is counted by the cache."""
+    db = DocDbLite(DbConfig(str(tmp_path), max_open_collections=2))
+    collections = [db.add_collection(f"collection{i}") for i in range(4)]
+    barrier = threading.Barrier(8)
+
+    def use(i: int) -> None:
+        barrier.wait()
+        for n in range(10):
+            collections[(i + n) % 4].insert_one({"n": n})
+
+    threads = [threading.Thread(target=use, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    collections[0].count_documents({"n": 1})  # evicts pools that were in use when they went cold
+    open_ctxs = [c._db_ctx for c in collections if c._db_ctx and c._db_ctx.is_open]
+    assert len(open_ctxs) <= 2
+    assert all(id(ctx) in db._db_ctx_cache._open for ctx in open_ctxs)
+    assert sum(c.count_documents({"n": 1}) for c in collections) == 8
+    db.close()
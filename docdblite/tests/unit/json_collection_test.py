@@ -0,0 +1,144 @@
+"""Check the JSON storage engine keeps the `Collection` API behaviour."""
+
+import json
+
+import pytest
+from source.db_config import DbConfig
+
+from docdblite import DocDbLite, StorageEngine
+
+test_json_str = """{
+  "id": "HOME001",
+  "name": "Home Appliances",
+  "subcategories": [
+    {
+      "id": "KITC001",
+      "products": [
+        {
+          "name": "SmartChef Oven",
+          "price": 599.99,
+          "inStock": true,
+          "specifications": {
+            "functions": ["Bake", "Roast"],
+            "powerConsumption": "1800W"
+          },
+          "reviews": [
+            {"userId": "U901234", "rating": 4.6, "something": [["one", "two"], ["three"]]}
+          ]
+        }
+      ]
+    }
+  ]
+}"""
+
+
+@pytest.mark.unit
+def test_json_engine_insert_find_count_delete(tmp_path) -> None:
+    """Insert documents into a JSON collection, filter on indexed and unindexed paths, and delete them."""
+    db = DocDbLite(DbConfig(str(tmp_path)))
+    testCollection = db.add_collection("testJsonCollection", StorageEngine.JSON)
+
+    expected_doc = json.loads(test_json_str)
+    doc_id = testCollection.insert_one(document=test_json_str)
+    assert testCollection.find_one(doc_id) == expected_doc
+
+    testCollection.create_index("testKey2.testKey3")
+    testCollection.insert_one(document={"testKey1": "testValue1", "testKey2": {"testKey3": 100}})
+    testCollection.insert_one(document={"testKey1": "testValue1", "testKey2": {"testKey3": 200}})
+
+    assert testCollection.count_documents({"testKey1": "testValue1"}) == 2
+    assert testCollection.count_documents({"testKey2.testKey3": 200}) == 1
+    assert testCollection.count_documents({"_id": doc_id}) == 1
+    assert testCollection.find({"id": "HOME001"}) == [expected_doc]
+
+    with testCollection.db_ctx as ctx:
+        where, params = testCollection._filter_dict_to_sql_where(
+            {"testKey2.testKey3": 200}, ctx
+        )
+        plan = ctx.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT uuid FROM testjsoncollection WHERE " + where,
+            params,
+        ).fetchall()
+    assert "idx_testKey2_testKey3" in str(plan)
+
+    testCollection.delete_one({"testKey1": "testValue1"})
+    assert testCollection.count_documents({"testKey1": "testValue1"}) == 1
+    db.close()
+
+
+@pytest.mark.unit
+def test_storage_engine_persisted_in_catalog(tmp_path) -> None:
+    """The storage engine of a collection is read back from the catalog."""
+    db = DocDbLite(DbConfig(str(tmp_path)))
+    db.add_collection("testJsonCollection", StorageEngine.JSON)
+    db.close()
+
+    db = DocDbLite(DbConfig(str(tmp_path)))
+    assert db.get_collection("testJsonCollection").storage_engine == StorageEngine.JSON
+    with pytest.raises(ValueError):
+        db.add_collection("testJsonCollection", StorageEngine.NODES)
+    db.close()
+
+
+@pytest.mark.unit
+def test_create_index_added_by_another_client(tmp_path) -> None:
+    """create_index on a path another client already indexed doesn't add the column again."""
+    db1 = DocDbLite(DbConfig(str(tmp_path)))
+    db2 = DocDbLite(DbConfig(str(tmp_path)))
+    collection1 = db1.add_collection("testJsonCollection", StorageEngine.JSON)
+    collection2 = db2.add_collection("testJsonCollection", StorageEngine.JSON)
+    collection1.insert_one(document={"testKey1": "testValue1"})
+    collection2.insert_one(document={"testKey1": "testValue2"})
+
+    collection1.create_index("testKey1")
+    collection2.create_index("testKey1")
+
+    assert collection2._indexed_columns == {"testKey1": "idx_testKey1"}
+    assert collection2.count_documents({"testKey1": "testValue1"}) == 1
+    db1.close()
+    db2.close()
+
+
+@pytest.mark.unit
+def test_filters_match_the_same_documents_in_both_engines(tmp_path) -> None:
+    """The same filters match the same documents whichever storage engine the collection uses."""
+    db = DocDbLite(DbConfig(str(tmp_path)))
+    doc = {
+        "name": "SmartChef Oven",
+        "specifications": {"capacity": "30L", "functions": ["Bake", "Roast"]},
+        "reviews": [{"rating": 4, "comment": "good"}, {"rating": 5, "tags": ["quiet"]}],
+        "dimensions": [[60, 50], [40]],
+    }
+    filters_and_counts = [
+        ({"capacity": "30L"}, 1),  # a key without dots matches at any depth
+        ({"specifications.capacity": "30L"}, 1),
+        ({"capacity.specifications": "30L"}, 0),
+        ({"rating": 4}, 1),  # through arrays of objects
+        ({"reviews.rating": 5}, 1),
+        ({"reviews.rating": [3, 4]}, 1),
+        ({"reviews.rating": 3}, 0),
+        ({"functions": "Roast"}, 1),  # array elements
+        ({"specifications.functions": "Bake"}, 1),
+        ({"reviews.tags": "quiet"}, 1),
+        ({"dimensions": 40}, 1),  # nested arrays
+        ({"name": "SmartChef Oven", "rating": 5}, 1),  # each key can match a different value
+        ({"name": "SmartChef Oven", "rating": 3}, 0),
+        ({"tags": "good"}, 0),
+        ({"missing": "30L"}, 0),
+    ]
+
+    for storage_engine in (StorageEngine.NODES, StorageEngine.JSON):
+        testCollection = db.add_collection(f"testParity{storage_engine.value}", storage_engine)
+        doc_id = testCollection.insert_one(document=doc)
+        testCollection.insert_one(document={"name": "Kettle", "rating": 2})
+        if storage_engine == StorageEngine.JSON:
+            testCollection.create_index("reviews.rating")
+            testCollection.create_index("specifications.capacity")
+
+        assert testCollection.count_documents({}) == 2
+        assert testCollection.find({}) == [doc, {"name": "Kettle", "rating": 2}]
+
+        for filter, count in filters_and_counts + [({"_id": doc_id}, 1)]:
+            assert testCollection.count_documents(filter) == count, (storage_engine, filter)
+            assert testCollection.find(filter) == [doc] * count, (storage_engine, filter)
+    db.close()
@@ -0,0 +1,53 @@
+"""Check that a collection created before the key dictionary is migrated when it's opened."""
+
+import sqlite3
+
+import pytest
+from source.db_config import DbConfig
+
+from docdblite import DocDbLite
+
+
+@pytest.mark.unit
+def test_open_collection_with_key_column_layout(tmp_path) -> None:
+    """Open a collection file where the data table stores the key string in every row."""
+    conn = sqlite3.connect(tmp_path / "products.sqlite")
+    conn.execute("CREATE TABLE products (uuid TEXT(36) PRIMARY KEY)")
+    conn.execute(
+        """
+        CREATE TABLE products_data (
+            uuid TEXT(36) PRIMARY KEY,
+            doc_id TEXT(36) NOT NULL,
+            parent_uuid TEXT(36),
+            key TEXT NOT NULL,
+            type integer NOT NULL,
+            value
+        )
+        """
+    )
+    # {"name": "SmartChef Oven", "functions": ["Bake"]} as the key column layout stored it
+    conn.execute("INSERT INTO products (uuid) VALUES ('doc1')")
+    conn.executemany(
+        "INSERT INTO products_data (uuid, doc_id, parent_uuid, key, type, value) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            ("node1", "doc1", "None", "name", 20, "SmartChef Oven"),
+            ("node2", "doc1", "None", "functions", 15, None),
+            ("node3", "doc1", "node2", 0, 20, "Bake"),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    db = DocDbLite(DbConfig(str(tmp_path)))
+    testCollection = db.add_collection("products")
+
+    assert testCollection.find_one("doc1") == {
+        "name": "SmartChef Oven",
+        "functions": ["Bake"],
+    }
+    assert testCollection.count_documents({"name": "SmartChef Oven"}) == 1
+
+    doc = {"name": "QuickBoil Kettle", "functions": ["Boil"]}
+    doc_id = testCollection.insert_one(document=doc)
+    assert testCollection.find_one(doc_id) == doc
+    db.close()
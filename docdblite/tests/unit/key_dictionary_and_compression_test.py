@@ -0,0 +1,89 @@
+"""Check that interned keys and compressed string values are stored compactly and read back unchanged."""
+
+import pytest
+from source.db_config import DbConfig
+
+from docdblite import DocDbLite
+
+
+@pytest.mark.unit
+def test_keys_are_interned_once_per_collection() -> None:
+    """Insert two documents with the same keys and check each key is stored once in the key dictionary."""
+    db = DocDbLite(DbConfig("../.docdblitedata-tests"))
+    testCollection = db.add_collection("testKeyDictionaryCollection")
+
+    doc = {"specifications": {"powerConsumption": "1800W"}, "tags": ["a", "b"]}
+    doc_id1 = testCollection.insert_one(document=doc)
+    doc_id2 = testCollection.insert_one(document=doc)
+
+    assert testCollection.find_one(doc_id1) == doc
+    assert testCollection.find_one(doc_id2) == doc
+
+    with testCollection.db_ctx as ctx:
+        keys = [
+            row[0]
+            for row in ctx.conn.execute(
+                "SELECT key FROM testkeydictionarycollection_keys"
+            ).fetchall()
+        ]
+    for key in ("specifications", "powerConsumption", "tags", "0", "1"):
+        assert keys.count(key) == 1
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("compression", ["zlib", "lzma"])
+def test_compressed_string_values_round_trip(compression) -> None:
+    """Insert a document with a long string value and check it's stored compressed and read back unchanged."""
+    db = DocDbLite(
+        DbConfig(
+            "../.docdblitedata-tests",
+            compression=compression,
+            compression_threshold_bytes=64,
+        )
+    )
+    testCollection = db.add_collection(f"testCompression{compression}Collection")
+
+    doc = {"comment": "Love the smart features and versatility! " * 20, "short": "ok"}
+    doc_id = testCollection.insert_one(document=doc)
+
+    assert testCollection.find_one(doc_id) == doc
+    assert testCollection.count_documents({"short": "ok"}) >= 1
+    assert testCollection.count_documents({"comment": doc["comment"]}) >= 1
+    assert doc in testCollection.find({"comment": doc["comment"]})
+
+    with testCollection.db_ctx as ctx:
+        stored = ctx.conn.execute(
+            f"SELECT value FROM testcompression{compression}collection_data WHERE doc_id = ? AND typeof(value) = 'blob'",
+            (str(doc_id),),
+        ).fetchall()
+    assert len(stored) == 1
+    assert len(stored[0][0]) < len(doc["comment"])
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "compression, compression_threshold_bytes",
+    [(None, 256), ("lzma", 64), ("zlib", 4096)],
+)
+def test_compressed_string_values_match_with_another_config(
+    tmp_path, compression, compression_threshold_bytes
+) -> None:
+    """Values compressed under one config still match equality filters after reopening with another config."""
+    db = DocDbLite(
+        DbConfig(str(tmp_path), compression="zlib", compression_threshold_bytes=64)
+    )
+    comment = "Love the smart features and versatility! " * 20
+    db.add_collection("testCompressionCollection").insert_one(document={"comment": comment})
+    db.close()
+
+    db = DocDbLite(
+        DbConfig(
+            str(tmp_path),
+            compression=compression,
+            compression_threshold_bytes=compression_threshold_bytes,
+        )
+    )
+    testCollection = db.get_collection("testCompressionCollection")
+    assert testCollection.count_documents({"comment": comment}) == 1
+    assert testCollection.find({"comment": comment}) == [{"comment": comment}]
+    db.close()
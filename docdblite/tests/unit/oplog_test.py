@@ -0,0 +1,135 @@
+"""Check that inserts and deletes are recorded in the oplog and can be consumed with `watch`."""
+
+import threading
+
+import pytest
+from source.db_config import DbConfig
+
+from docdblite import DocDbLite, StorageEngine
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("storage_engine", [StorageEngine.NODES, StorageEngine.JSON])
+def test_watch_changes_and_resume(tmp_path, storage_engine) -> None:
+    """Watch inserts and deletes from the start of the oplog and resume after the last change seen."""
+    db = DocDbLite(DbConfig(str(tmp_path), oplog=True))
+    testCollection = db.add_collection("testOplogCollection", storage_engine)
+
+    doc1 = {"testKey1": "testValue1"}
+    doc_id1 = testCollection.insert_one(document=doc1)
+    doc_id2 = testCollection.insert_one(document={"testKey1": "testValue2"})
+    testCollection.delete_one({"testKey1": "testValue1"})
+
+    changes = list(testCollection.watch(resume_after=0, batch_size=2))
+    assert [(c["op"], c["doc_id"]) for c in changes] == [
+        ("insert", str(doc_id1)),
+        ("insert", str(doc_id2)),
+        ("delete", str(doc_id1)),
+    ]
+    assert changes[0]["document"] == doc1
+    assert changes[2]["document"] is None
+
+    assert list(testCollection.watch()) == []  # defaults to after the latest change
+
+    changes_after_now = testCollection.watch()
+    doc_id3 = testCollection.insert_one(document={"testKey1": "testValue3"})
+    assert [c["doc_id"] for c in changes_after_now] == [str(doc_id3)]
+    assert [c["seq"] for c in testCollection.watch(resume_after=changes[1]["seq"])] == [
+        changes[2]["seq"],
+        changes[2]["seq"] + 1,
+    ]
+    db.close()
+
+
+@pytest.mark.unit
+def test_oplog_retention(tmp_path) -> None:
+    """The oplog keeps the most recent entries and resuming from truncated entries is an error."""
+    db = DocDbLite(DbConfig(str(tmp_path), oplog=True, oplog_max_entries=2))
+    testCollection = db.add_collection("testOplogCollection")
+
+    for i in range(4):
+        testCollection.insert_one(document={"n": i})
+
+    assert [c["document"] for c in testCollection.watch(resume_after=2)] == [
+        {"n": 2},
+        {"n": 3},
+    ]
+    with pytest.raises(ValueError):
+        testCollection.watch(resume_after=0)
+
+    testCollection.truncate_oplog(4)
+    with pytest.raises(ValueError):
+        testCollection.watch(resume_after=3)
+    db.close()
+
+
+@pytest.mark.unit
+def test_watch_raises_when_unread_changes_are_truncated(tmp_path) -> None:
+    """Changes truncated by retention while a watch is iterating are an error, not skipped."""
+    db = DocDbLite(DbConfig(str(tmp_path), oplog=True, oplog_max_entries=3))
+    testCollection = db.add_collection("testOplogCollection")
+    testCollection.insert_one(document={"n": 0})
+
+    changes = testCollection.watch(resume_after=0, block=True, max_poll_interval_ms=50)
+    assert next(changes)["document"] == {"n": 0}
+    for i in range(1, 8):
+        testCollection.insert_one(document={"n": i})
+    with pytest.raises(ValueError):
+        next(changes)
+
+    changes = testCollection.watch(resume_after=6)
+    testCollection.truncate_oplog(8)
+    with pytest.raises(ValueError):  # nothing is left to read but change 7 was truncated
+        next(changes)
+    db.close()
+
+
+@pytest.mark.unit
+def test_watch_blocks_for_new_changes(tmp_path) -> None:
+    """A blocking watch waits for changes made after it started."""
+    db = DocDbLite(DbConfig(str(tmp_path), oplog=True))
+    testCollection = db.add_collection("testOplogCollection")
+
+    changes = testCollection.watch(resume_after=0, block=True, max_poll_interval_ms=50)
+    timer = threading.Timer(0.1, testCollection.insert_one, args=({"n": 1},))
+    timer.start()
+
+    assert next(changes)["document"] == {"n": 1}
+    timer.join()
+    db.close()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("storage_engine", [StorageEngine.NODES, StorageEngine.JSON])
+def test_failed_delete_is_rolled_back(tmp_path, monkeypatch, storage_engine) -> None:
+    """A delete that fails writing the oplog leaves the document and the oplog unchanged."""
+    db = DocDbLite(DbConfig(str(tmp_path), oplog=True))
+    testCollection = db.add_collection("testOplogCollection", storage_engine)
+    doc_id = testCollection.insert_one(document={"testKey1": "testValue1"})
+
+    def fail(*args):
+        raise RuntimeError("oplog write failed")
+
+    with monkeypatch.context() as m:
+        m.setattr(testCollection, "_append_oplog", fail)
+        with pytest.raises(RuntimeError):
+            testCollection.delete_one({"testKey1": "testValue1"})
+
+    testCollection.insert_one(document={"testKey1": "testValue2"})  # commits on the same pool
+    assert testCollection.find_one(doc_id) == {"testKey1": "testValue1"}
+    assert [c["op"] for c in testCollection.watch(resume_after=0)] == ["insert", "insert"]
+    db.close()
+
+
+@pytest.mark.unit
+def test_oplog_disabled_by_default(tmp_path) -> None:
+    """Changes aren't recorded unless the oplog is enabled, and watching without it is an error."""
+    db = DocDbLite(DbConfig(str(tmp_path)))
+    testCollection = db.add_collection("testOplogCollection")
+    testCollection.insert_one(document={"testKey1": "testValue1"})
+
+    with pytest.raises(ValueError):
+        testCollection.watch(resume_after=0)
+    with testCollection.db_ctx as ctx:
+        assert ctx.conn.execute("SELECT COUNT(*) FROM testoplogcollection_oplog").fetchone()[0] == 0
+    db.close()
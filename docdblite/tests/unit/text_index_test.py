@@ -0,0 +1,91 @@
+"""Check full-text search over string values with the `$text` filter operator."""
+
+import pytest
+from source.db_config import DbConfig
+
+from docdblite import DocDbLite
+
+oven = {
+    "name": "SmartChef Oven",
+    "connectivity": "Wi-Fi",
+    "reviews": [
+        {"rating": 4.6, "comment": "Love the smart features of this oven!"},
+        {"rating": 3.0, "comment": "Oven is fine"},
+    ],
+}
+kettle = {
+    "name": "QuickBoil Kettle",
+    "reviews": [{"rating": 4.0, "comment": "Boils fast. Better than my old oven timer."}],
+}
+toaster = {"name": "Toaster", "reviews": [{"rating": 2.0, "comment": "Burns toast"}]}
+
+
+@pytest.mark.unit
+def test_text_search_ranked_and_kept_in_sync(tmp_path) -> None:
+    """Index product names and review comments, search them, and check deletes remove documents from the index."""
+    db = DocDbLite(DbConfig(str(tmp_path)))
+    testCollection = db.add_collection("testTextIndex")
+
+    testCollection.insert_one(document=kettle)  # indexed when the index is created
+    testCollection.create_text_index(["name", "connectivity", "reviews.comment"])
+    testCollection.insert_one(document=oven)  # indexed on insert
+    testCollection.insert_one(document=toaster)
+
+    results = testCollection.find({"$text": {"$search": "oven"}})
+    assert results == [oven, kettle]
+
+    assert testCollection.count_documents({"$text": {"$search": "oven"}}) == 2
+    assert testCollection.count_documents({"$text": {"$search": "toast"}}) == 1
+    assert testCollection.find({"$text": {"$search": "rating"}}) == []
+
+    assert testCollection.find({"$text": {"$search": "Wi-Fi"}}) == [oven]
+    for search in ("don't", "C++", '"unbalanced'):
+        assert testCollection.find({"$text": {"$search": search}}) == []
+
+    testCollection.delete_one({"$text": {"$search": "kettle"}})
+    assert testCollection.find({"$text": {"$search": "oven"}}) == [oven]
+
+    with testCollection.db_ctx as ctx:
+        plan = ctx.conn.execute(
+            f"""
+            EXPLAIN QUERY PLAN DELETE FROM {testCollection._collection_text_table_name}
+            WHERE rowid IN (SELECT text_rowid FROM {testCollection._collection_text_docs_table_name} WHERE doc_id = ?)
+            """,
+            ("doc",),
+        ).fetchall()
+    # text rows of a document are found by the doc_id index and deleted by rowid, not by scanning the index
+    assert "_doc_id" in str(plan)
+    assert "INDEX 0:=" in str(plan)
+    db.close()
+
+
+@pytest.mark.unit
+def test_text_search_without_index_raises(tmp_path) -> None:
+    """A `$text` filter on a collection without a text index is an error."""
+    db = DocDbLite(DbConfig(str(tmp_path)))
+    testCollection = db.add_collection("testNoTextIndex")
+
+    with pytest.raises(ValueError):
+        testCollection.count_documents({"$text": {"$search": "oven"}})
+    db.close()
+
+
+@pytest.mark.unit
+def test_text_index_created_by_another_client(tmp_path) -> None:
+    """Inserts and deletes by a client opened before another client created the text index keep the index in sync."""
+    db1 = DocDbLite(DbConfig(str(tmp_path)))
+    db2 = DocDbLite(DbConfig(str(tmp_path)))
+    collection1 = db1.add_collection("testTextIndex")
+    collection2 = db2.add_collection("testTextIndex")
+    collection1.insert_one(document={"name": "first oven"})  # opens the collection before the index exists
+    collection1.insert_one(document={"name": "old oven"})
+
+    collection2.create_text_index(["name"])
+    collection1.insert_one(document={"name": "new oven"})
+    collection1.delete_one({"name": "first oven"})
+
+    for collection in (collection1, collection2):
+        results = collection.find({"$text": {"$search": "oven"}})
+        assert sorted(doc["name"] for doc in results) == ["new oven", "old oven"]
+    db1.close()
+    db2.close()